@@ -16,9 +16,9 @@ def create_server() -> FastMCP:
     """Create and configure the MCP server."""
     # Initialize components
     glossary_manager = GlossaryManager(Config.GLOSSARY_PATH)
-    exact_search = ExactSearch(glossary_manager)
     fuzzy_search = FuzzySearch(glossary_manager)
-    agentic_search = AgenticSearch(glossary_manager, Config.DEFAULT_MODEL)
+    exact_search = ExactSearch(glossary_manager, fuzzy_search)
+    agentic_search = AgenticSearch(glossary_manager, Config.DEFAULT_MODEL, fuzzy_search)
     
     # Create server
     server = FastMCP(
@@ -41,13 +41,12 @@ def create_server() -> FastMCP:
         """
         print(f"MCP Tool 'lookup_term' called with: term='{term}'")
         
-        results = exact_search.lookup(term)
-        response = [result.model_dump() for result in results]
+        response = exact_search.lookup_dump(term)
         
-        if results and results[0].match_type == "exact":
-            print(f"Exact match found: {results[0].term}")
+        if response and response[0]["match_type"] == "exact":
+            print(f"Exact match found: {response[0]['term']}")
         else:
-            print(f"No exact match, returning {len(results)} suggestions")
+            print(f"No exact match, returning {len(response)} suggestions")
         
         return response
 
@@ -64,10 +63,7 @@ def create_server() -> FastMCP:
         """
         print(f"MCP Tool 'batch_lookup_terms' called with {len(terms)} terms: {terms}")
         
-        results = {}
-        for term in terms:
-            lookup_results = exact_search.lookup(term)
-            results[term] = [result.model_dump() for result in lookup_results]
+        results = exact_search.batch_lookup(terms)
         
         exact_matches = sum(1 for term_results in results.values() 
                           if term_results and term_results[0].get('match_type') == 'exact')
@@ -89,10 +85,9 @@ def create_server() -> FastMCP:
         """
         print(f"MCP Tool 'fuzzy_search' called with: query='{query}', threshold={threshold}")
         
-        results = fuzzy_search.search(query, threshold)
-        response = [result.model_dump() for result in results]
+        response = fuzzy_search.search_dump(query, threshold)
         
-        print(f"Fuzzy search found {len(results)} matches")
+        print(f"Fuzzy search found {len(response)} matches")
         return response
 
     @server.tool()
@@ -110,7 +105,10 @@ def create_server() -> FastMCP:
         print(f"MCP Tool 'smart_query' called with: query='{query}', context='{context}'")
         
         results = await agentic_search.search(query, context)
-        response = [result.model_dump() for result in results]
+        response = [
+            glossary_manager.get_term_dump(result.term, result.confidence, result.match_type)
+            for result in results
+        ]
         
         print(f"Smart query found {len(results)} relevant terms")
         return response
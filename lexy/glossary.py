@@ -2,48 +2,212 @@
 Glossary data management for Lexy.
 """
 
+import bisect
+import os
+import pickle
+import re
+import numpy as np
 import yaml
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Callable, Dict, List, Any, Optional
+from rank_bm25 import BM25Okapi
 
 from .models import GlossaryTerm, Definition
 
+# Prefer the libyaml-backed C loader/dumper, falling back to pure Python
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
+# Bump when the set or shape of cached indexes changes to invalidate old cache files
+CACHE_VERSION = 6
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens for BM25."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _load_one(path: str) -> Dict[str, Dict[str, Any]]:
+    """Parse a single glossary YAML file (module-level so worker processes can run it)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.load(f, Loader=SafeLoader)
+
 
 class GlossaryManager:
     """Manages loading and accessing glossary data."""
     
+    # Parsed glossary and derived indexes persisted to the sidecar cache
+    _CACHED_ATTRS = (
+        "glossary",
+        "normalized_terms",
+        "all_searchable_terms",
+        "search_index_lower",
+        "search_index_original",
+        "max_term_len",
+        "term_objects",
+        "term_dumps",
+        "term_texts",
+        "term_objects_by_lower",
+        "term_dumps_by_lower",
+        "_sorted_terms",
+        "_sorted_lower",
+        "_sorted_lower_keys",
+        "_all_terms_text",
+    )
+    
     def __init__(self, glossary_path: str):
         self.glossary_path = glossary_path
         self.glossary: Dict[str, Dict[str, Any]] = {}
         self.normalized_terms: Dict[str, str] = {}  # lowercase -> original case
         self.all_searchable_terms: List[str] = []  # For search processing
+        self.search_index_lower: List[str] = []  # Deduplicated, lowercased searchable terms
+        self.search_index_original: List[str] = []  # Glossary term each index entry resolves to
+        self.max_term_len: int = 0  # Longest entry in search_index_lower
+        self.term_objects: Dict[str, GlossaryTerm] = {}  # Prebuilt term models
+        self.term_dumps: Dict[str, Dict[str, Any]] = {}  # Prebuilt TermResult dicts
+        self.term_texts: Dict[str, str] = {}  # Per-term text for AI processing
+        self.term_objects_by_lower: Dict[str, GlossaryTerm] = {}  # lowercase term/see-also -> term model
+        self.term_dumps_by_lower: Dict[str, Dict[str, Any]] = {}  # lowercase term/see-also -> result dict
+        self._sorted_terms: List[str] = []  # Terms in list_terms() output order
+        self._sorted_lower: List[str] = []  # Terms ordered case-insensitively, for prefix ranges
+        self._sorted_lower_keys: List[str] = []  # Lowercased _sorted_lower, for bisect
+        self._all_terms_text: Optional[str] = None  # Built lazily by get_all_terms_text()
+        self._bm25: Optional[BM25Okapi] = None  # Built lazily by bm25_search()
+        self._bm25_terms: List[str] = []  # Term for each BM25 document
+        self._reload_callbacks: List[Callable[[], None]] = []
         self.load_glossary()
     
     def load_glossary(self):
-        """Load glossary from YAML file."""
+        """Load glossary from a YAML file or directory, reusing the sidecar cache when it is fresh."""
         try:
             if Path(self.glossary_path).exists():
-                with open(self.glossary_path, 'r', encoding='utf-8') as f:
-                    # Auto-detect format based on file extension
-                    self.glossary = yaml.safe_load(f)
-                        
+                files = self._glossary_files()
+                stats = [os.stat(path) for path in files]
+                cache_key = (CACHE_VERSION, tuple(
+                    (path, stat.st_mtime_ns, stat.st_size) for path, stat in zip(files, stats)
+                ))
                 
-                self._build_search_indexes()
-                print(f"Loaded {len(self.glossary)} terms from {self.glossary_path}")
+                if self._load_cache(cache_key):
+                    print(f"Loaded {len(self.glossary)} terms from cache for {self.glossary_path}")
+                else:
+                    self.glossary = self._parse_glossary_files(files)
+                    self._build_search_indexes()
+                    self._write_cache(cache_key)
+                    print(f"Loaded {len(self.glossary)} terms from {self.glossary_path}")
             else:
                 print(f"Glossary file {self.glossary_path} not found, starting with empty glossary")
         except Exception as e:
             print(f"Error loading glossary: {e}")
             self.glossary = {}
-            self.normalized_terms = {}
-            self.all_searchable_terms = []
+            self._build_search_indexes()
+        self._invalidate_caches()
+    
+    def _glossary_files(self) -> List[str]:
+        """YAML files making up the glossary: the path itself, or the *.yaml/*.yml files in it."""
+        path = Path(self.glossary_path)
+        if path.is_dir():
+            return sorted(str(p) for p in path.iterdir() if p.suffix in (".yaml", ".yml"))
+        return [self.glossary_path]
+    
+    def _parse_glossary_files(self, files: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Parse glossary files, merging directories of YAML files parsed in worker processes."""
+        if not Path(self.glossary_path).is_dir():
+            return _load_one(self.glossary_path)
+        
+        glossary: Dict[str, Dict[str, Any]] = {}
+        workers = min(len(files), os.cpu_count() or 1)
+        if workers <= 1:
+            # Nothing to parallelize; don't pay for starting a worker process
+            for data in map(_load_one, files):
+                glossary.update(data or {})
+            return glossary
+        
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map() preserves file order, so later files win on duplicate terms
+            for data in pool.map(_load_one, files):
+                glossary.update(data or {})
+        return glossary
+    
+    def _cache_path(self) -> str:
+        """Path of the pickled sidecar cache next to the glossary file or directory."""
+        return os.path.normpath(self.glossary_path) + ".cache"
+    
+    def _load_cache(self, cache_key: tuple) -> bool:
+        """Restore the glossary and its indexes from the sidecar cache if it matches cache_key."""
+        try:
+            with open(self._cache_path(), 'rb') as f:
+                cached = pickle.load(f)
+            if cached.get("key") != cache_key:
+                return False
+            data = cached["data"]
+            for attr in self._CACHED_ATTRS:
+                setattr(self, attr, data[attr])
+            # The BM25 index is not cached; rebuild it from the restored term texts on demand
+            self._bm25 = None
+            self._bm25_terms = []
+            return True
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"Ignoring unreadable glossary cache: {e}")
+            return False
+    
+    def _write_cache(self, cache_key: tuple):
+        """Atomically write the glossary and its indexes to the sidecar cache."""
+        self.get_all_terms_text()  # Make sure the agent corpus is cached too
+        cache_path = self._cache_path()
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(
+                    {"key": cache_key, "data": {attr: getattr(self, attr) for attr in self._CACHED_ATTRS}},
+                    f,
+                    protocol=pickle.HIGHEST_PROTOCOL
+                )
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            print(f"Could not write glossary cache: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    def on_reload(self, callback: Callable[[], None]):
+        """Register a callback to run whenever the glossary is reloaded or saved."""
+        self._reload_callbacks.append(callback)
+    
+    def _invalidate_caches(self):
+        """Notify dependents that cached search results are stale."""
+        for callback in self._reload_callbacks:
+            callback()
     
     def _build_search_indexes(self):
-        """Build normalized lookup and searchable terms list."""
+        """Build normalized lookup, searchable terms list and term objects."""
         self.normalized_terms = {}
         self.all_searchable_terms = []
+        self.term_objects = {}
+        self.term_dumps = {}
+        self.term_texts = {}
+        self._all_terms_text = None
+        self._bm25 = None
         
         for term in self.glossary.keys():
+            # Build the term model and its response dict once; the glossary is read-only at runtime
+            term_obj = self._build_term_object(term)
+            self.term_objects[term] = term_obj
+            self.term_dumps[term] = {
+                "term": term,
+                "definitions": [
+                    {"text": d.text, "see_also": list(d.see_also)} for d in term_obj.definitions
+                ],
+                "confidence": 1.0,
+                "match_type": "exact"
+            }
+            self.term_texts[term] = self._build_term_text(term_obj)
+            
             # Add main term
             self.normalized_terms[term.lower()] = term
             self.all_searchable_terms.append(term)
@@ -55,16 +219,43 @@ class GlossaryManager:
                     for see_also in definition['see_also']:
                         self.normalized_terms[see_also.lower()] = term
                         self.all_searchable_terms.append(see_also)
+        
+        # Resolve lowercase lookups straight to the shared term model/dict in one probe
+        self.term_objects_by_lower = {
+            lower: self.term_objects[term] for lower, term in self.normalized_terms.items()
+        }
+        self.term_dumps_by_lower = {
+            lower: self.term_dumps[term] for lower, term in self.normalized_terms.items()
+        }
+        
+        # Fuzzy matching runs over each distinct lowercased string once, so rapidfuzz
+        # neither scores repeated see-also entries nor lowercases choices per call
+        self.search_index_lower = list(dict.fromkeys(t.lower() for t in self.all_searchable_terms))
+        self.search_index_original = [self.normalized_terms[t] for t in self.search_index_lower]
+        self.max_term_len = max(map(len, self.search_index_lower), default=0)
+        
+        # Sorted views so list_terms() can answer prefix queries with a bisect range
+        self._sorted_terms = sorted(self.glossary.keys())
+        self._sorted_lower = sorted(self.glossary.keys(), key=str.lower)
+        self._sorted_lower_keys = [t.lower() for t in self._sorted_lower]
     
     def get_term_data(self, term: str) -> Dict[str, Any]:
         """Get raw term data from glossary."""
         return self.glossary.get(term, {})
     
     def get_term_object(self, term: str) -> GlossaryTerm:
-        """Get a GlossaryTerm object from the new format."""
+        """Get the cached GlossaryTerm object for a term."""
+        return self.term_objects.get(term) or GlossaryTerm(term=term, definitions=())
+    
+    def get_term_dump(self, term: str, confidence: float = 1.0, match_type: str = "exact") -> Dict[str, Any]:
+        """Get a TermResult-shaped dict for a term without going through pydantic."""
+        return {**self.term_dumps[term], "confidence": confidence, "match_type": match_type}
+    
+    def _build_term_object(self, term: str) -> GlossaryTerm:
+        """Build a GlossaryTerm object from the new format."""
         term_data = self.get_term_data(term)
         if not term_data:
-            return GlossaryTerm(term=term, definitions=[])
+            return GlossaryTerm(term=term, definitions=())
         
         # Convert dict definitions to Definition objects
         definitions = []
@@ -76,9 +267,12 @@ class GlossaryManager:
                 ))
             else:
                 # Fallback for unexpected format
-                definitions.append(Definition(text=str(def_data), see_also=[]))
+                definitions.append(Definition(text=str(def_data), see_also=()))
         
-        return GlossaryTerm(term=term, definitions=definitions)
+        # Union of see-also terms across definitions, deduplicated in first-seen order
+        see_also_union = tuple(dict.fromkeys(s for d in definitions for s in d.see_also))
+        
+        return GlossaryTerm(term=term, definitions=definitions, see_also_union=see_also_union)
     
     def term_exists(self, term: str) -> bool:
         """Check if a term exists in the glossary."""
@@ -90,39 +284,75 @@ class GlossaryManager:
     
     def list_terms(self, prefix: str = None) -> List[str]:
         """List available terms with optional prefix filtering."""
-        terms = list(self.glossary.keys())
-        
-        if prefix:
-            prefix_lower = prefix.lower()
-            terms = [term for term in terms if term.lower().startswith(prefix_lower)]
+        if not prefix:
+            return list(self._sorted_terms)
         
-        return sorted(terms)
+        prefix_lower = prefix.lower()
+        keys = self._sorted_lower_keys
+        lo = bisect.bisect_left(keys, prefix_lower)
+        # Walk the matching run rather than bisecting to a sentinel, which would miss
+        # terms continuing with characters above it (e.g. emoji outside the BMP)
+        hi = lo
+        while hi < len(keys) and keys[hi].startswith(prefix_lower):
+            hi += 1
+        return sorted(self._sorted_lower[lo:hi])
     
     def get_all_terms_text(self) -> str:
         """Get all terms and definitions as text for AI processing."""
-        text_parts = []
-        for term in self.glossary.keys():
-            term_obj = self.get_term_object(term)
-            definitions_text = "; ".join([def_.text for def_ in term_obj.definitions])
-            text_parts.append(f"{term}: {definitions_text}")
-            
-            # Add see-also information
-            all_see_also = []
-            for definition in term_obj.definitions:
-                all_see_also.extend(definition.see_also)
-            
-            if all_see_also:
-                unique_see_also = list(set(all_see_also))
-                text_parts.append(f"  (See also: {', '.join(unique_see_also)})")
+        if self._all_terms_text is None:
+            self._all_terms_text = "\n".join(self.term_texts.values())
+        return self._all_terms_text
+    
+    def get_terms_text(self, terms: List[str]) -> str:
+        """Get the AI-processing text for just the given terms, in the order given."""
+        return "\n".join(self.term_texts[term] for term in terms if term in self.term_texts)
+    
+    def _build_term_text(self, term_obj: GlossaryTerm) -> str:
+        """Render a term, its definitions and see-also terms as text for AI processing."""
+        definitions_text = "; ".join([def_.text for def_ in term_obj.definitions])
+        text = f"{term_obj.term}: {definitions_text}"
         
-        return "\n".join(text_parts)
+        # Add see-also information
+        if term_obj.see_also_union:
+            text += f"\n  (See also: {', '.join(term_obj.see_also_union)})"
+        return text
+    
+    def bm25_search(self, query: str, k: int = 50) -> List[str]:
+        """Rank terms by BM25 relevance of their text to the query, best first."""
+        if self._bm25 is None:
+            if not self.term_texts:
+                return []
+            # Built on first use and kept until the glossary is reloaded
+            self._bm25_terms = list(self.term_texts)
+            self._bm25 = BM25Okapi([_tokenize(self.term_texts[term]) for term in self._bm25_terms])
+        
+        tokens = _tokenize(query)
+        if not tokens:
+            return []
+        
+        scores = self._bm25.get_scores(tokens)
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        
+        # Partial sort: select the top k, then order only those
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [self._bm25_terms[i] for i in top if scores[i] > 0]
     
     def save_glossary(self):
-        """Save the current glossary to file."""
+        """Save the current glossary to file (single-file glossaries only)."""
+        if Path(self.glossary_path).is_dir():
+            # Terms are merged from several files on load, so there is no single file to write back to
+            print(f"Not saving glossary: {self.glossary_path} is a directory; saving supports single-file glossaries only")
+            return
+        
         try:
             with open(self.glossary_path, 'w', encoding='utf-8') as f:
                 # Auto-detect format based on file extension
-                yaml.dump(self.glossary, f, default_flow_style=False, allow_unicode=True, indent=2)
+                yaml.dump(self.glossary, f, Dumper=SafeDumper, default_flow_style=False, allow_unicode=True, indent=2)
+            self._build_search_indexes()
+            self._invalidate_caches()
             print(f"Saved glossary to {self.glossary_path}")
         except Exception as e:
             print(f"Error saving glossary: {e}") 
\ No newline at end of file
@@ -2,38 +2,60 @@
 Data models for Lexy glossary service.
 """
 
-from typing import List
-from pydantic import BaseModel
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from pydantic import BaseModel, ConfigDict
 
 
 class Definition(BaseModel):
     """A single definition with its own see-also references."""
+    model_config = ConfigDict(frozen=True)
+    
     text: str
-    see_also: List[str] = []
+    see_also: Tuple[str, ...] = ()
 
 
 class GlossaryTerm(BaseModel):
     """A single glossary term with definitions and see-also references."""
+    model_config = ConfigDict(frozen=True)
+    
     term: str
-    definitions: List[Definition]
+    definitions: Tuple[Definition, ...]
+    see_also_union: Tuple[str, ...] = ()  # Deduplicated see-also terms across all definitions
 
 
-class TermResult(BaseModel):
-    """A term result with metadata."""
+@dataclass(slots=True)
+class TermResult:
+    """A term result with metadata (a slotted dataclass to skip pydantic validation per search)."""
     term: str
-    definitions: List[Definition]
+    definitions: Sequence[Definition]
     confidence: float = 1.0  # 1.0 for exact matches, <1.0 for fuzzy matches
     match_type: str = "exact"  # "exact", "fuzzy", "suggestion", "agentic"
+    see_also_union: Optional[Sequence[str]] = None  # Precomputed all_see_also, when built from a GlossaryTerm
     
     @property
     def all_see_also(self) -> List[str]:
         """Get all see-also terms from all definitions."""
+        if self.see_also_union is not None:
+            return list(self.see_also_union)
         all_terms = []
         for definition in self.definitions:
             all_terms.extend(definition.see_also)
-        return list(set(all_terms))  # Remove duplicates
+        return list(dict.fromkeys(all_terms))  # Remove duplicates, keeping first-seen order
     
     @property
     def definition_texts(self) -> List[str]:
         """Get just the definition text strings for backward compatibility."""
-        return [definition.text for definition in self.definitions] 
\ No newline at end of file
+        return [definition.text for definition in self.definitions]
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """Get a JSON-compatible dict, equivalent to pydantic's model_dump()."""
+        return {
+            "term": self.term,
+            "definitions": [
+                {"text": definition.text, "see_also": list(definition.see_also)}
+                for definition in self.definitions
+            ],
+            "confidence": self.confidence,
+            "match_type": self.match_type
+        }
@@ -2,7 +2,9 @@
 Search functionality for Lexy glossary service.
 """
 
-from typing import List, Optional
+import functools
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
 from rapidfuzz import fuzz, process
 from pydantic_ai import Agent, RunContext
 
@@ -13,27 +15,26 @@ from .glossary import GlossaryManager
 class ExactSearch:
     """Handles exact term lookups with case-insensitive matching."""
 
-    def __init__(self, glossary_manager: GlossaryManager):
+    def __init__(self, glossary_manager: GlossaryManager, fuzzy_search: Optional["FuzzySearch"] = None):
         self.glossary = glossary_manager
+        self.fuzzy = fuzzy_search or FuzzySearch(glossary_manager)
 
     def lookup(self, term: str) -> List[TermResult]:
         """Exact term lookup with case-insensitive matching."""
         normalized_term = term.lower()
 
-        if normalized_term in self.glossary.normalized_terms:
-            original_term = self.glossary.normalized_terms[normalized_term]
-            term_obj = self.glossary.get_term_object(original_term)
-
+        term_obj = self.glossary.term_objects_by_lower.get(normalized_term)
+        if term_obj is not None:
             return [TermResult(
-                term=original_term,
+                term=term_obj.term,
                 definitions=term_obj.definitions,
                 confidence=1.0,
-                match_type="exact"
+                match_type="exact",
+                see_also_union=term_obj.see_also_union
             )]
 
         # If not found, provide fuzzy suggestions as potential matches
-        fuzzy_search = FuzzySearch(self.glossary)
-        suggestions = fuzzy_search.search(term, threshold=60)[:3]  # Top 3 suggestions
+        suggestions = self.fuzzy.search_lower(normalized_term, threshold=60, max_candidates=6)[:3]  # Top 3 suggestions
 
         # Mark them as suggestions
         for suggestion in suggestions:
@@ -41,33 +42,183 @@ class ExactSearch:
 
         return suggestions
 
+    def lookup_dump(self, term: str) -> List[dict]:
+        """Exact term lookup returning precomputed result dicts instead of TermResult models."""
+        normalized_term = term.lower()
+
+        term_dump = self.glossary.term_dumps_by_lower.get(normalized_term)
+        if term_dump is not None:
+            return [{**term_dump, "match_type": "exact"}]
+
+        # If not found, provide fuzzy suggestions as potential matches
+        return self.fuzzy.search_dump_lower(
+            normalized_term, threshold=60, max_candidates=6, match_type="suggestion"
+        )[:3]  # Top 3 suggestions
+
+    def batch_lookup(self, terms: List[str]) -> Dict[str, List[dict]]:
+        """Look up many terms in one pass, computing fuzzy suggestions only for the misses."""
+        term_dumps_by_lower = self.glossary.term_dumps_by_lower
+
+        results: Dict[str, List[dict]] = {}
+        misses = []
+        for term, normalized_term in zip(terms, [term.lower() for term in terms]):
+            term_dump = term_dumps_by_lower.get(normalized_term)
+            if term_dump is None:
+                results[term] = []  # Keep input order; filled in below
+                misses.append(term)
+            else:
+                results[term] = [{**term_dump, "match_type": "exact"}]
+
+        # Score all misses against the index in one batched call
+        suggestions = self.fuzzy.search_many(misses, threshold=60, max_candidates=6)
+        for term, matches in zip(misses, suggestions):
+            results[term] = [
+                self.glossary.get_term_dump(original_term, confidence, "suggestion")
+                for original_term, confidence in matches[:3]  # Top 3 suggestions
+            ]
+
+        return results
+
+
+# Longest term for which plain Indel ratio is used; rapidfuzz scores such strings
+# with a single 64-bit bit-parallel pass instead of WRatio's composite heuristics
+SHORT_TERM_MAX_LEN = 64
+
+# Upper bound on query x index cells scored per process.cdist call in search_many()
+CDIST_MAX_CELLS = 4_000_000
+
+# Slack for float32 rounding when collecting candidates tied at the top-k cutoff in search_many()
+CDIST_TIE_EPSILON = 1e-3
+
 
 class FuzzySearch:
     """Handles fuzzy matching using rapidfuzz for typos and variations."""
 
     def __init__(self, glossary_manager: GlossaryManager):
         self.glossary = glossary_manager
-
-    def search(self, query: str, threshold: int = 80) -> List[TermResult]:
+        self._scorer = self._select_scorer()
+        # Memoize matches per (lowercased query, threshold); dropped on glossary reload
+        self._match = functools.lru_cache(maxsize=1024)(self._match_uncached)
+        glossary_manager.on_reload(self.clear_cache)
+
+    def _select_scorer(self):
+        """Pick fuzz.ratio for glossaries of short terms, WRatio otherwise."""
+        if self.glossary.max_term_len <= SHORT_TERM_MAX_LEN:
+            return fuzz.ratio
+        return fuzz.WRatio
+
+    def clear_cache(self):
+        """Drop memoized fuzzy matches and re-pick the scorer for the reloaded glossary."""
+        self._scorer = self._select_scorer()
+        self._match.cache_clear()
+
+    def search(self, query: str, threshold: int = 80, max_candidates: int = 10) -> List[TermResult]:
         """Fuzzy search with similarity scoring using rapidfuzz."""
-        if not self.glossary.all_searchable_terms:
-            return []
+        return self.search_lower(query.lower(), threshold, max_candidates)
 
+    def search_lower(self, query_lower: str, threshold: int = 80, max_candidates: int = 10) -> List[TermResult]:
+        """Fuzzy search for a query the caller has already lowercased."""
         results = []
-        seen_terms = set()
+        for original_term, confidence in self._match(query_lower, threshold, max_candidates):
+            term_obj = self.glossary.get_term_object(original_term)
+            results.append(TermResult(
+                term=original_term,
+                definitions=term_obj.definitions,
+                confidence=confidence,
+                match_type="fuzzy",
+                see_also_union=term_obj.see_also_union
+            ))
+        return results
 
-        # Use rapidfuzz to find matches
+    def search_dump(self, query: str, threshold: int = 80, max_candidates: int = 10,
+                    match_type: str = "fuzzy") -> List[dict]:
+        """Fuzzy search returning precomputed result dicts instead of TermResult models."""
+        return self.search_dump_lower(query.lower(), threshold, max_candidates, match_type)
+
+    def search_dump_lower(self, query_lower: str, threshold: int = 80, max_candidates: int = 10,
+                          match_type: str = "fuzzy") -> List[dict]:
+        """Like search_dump() for a query the caller has already lowercased."""
+        return [
+            self.glossary.get_term_dump(original_term, confidence, match_type)
+            for original_term, confidence in self._match(query_lower, threshold, max_candidates)
+        ]
+
+    def _match_uncached(self, query: str, threshold: int, max_candidates: int) -> Tuple[Tuple[str, float], ...]:
+        """Find (original term, confidence) pairs for a lowercased query, best first.
+
+        At most max_candidates raw matches are scored before see-also duplicates are
+        folded into their main term, so callers wanting N results should ask for ~2N.
+        """
+        if not self.glossary.search_index_lower:
+            return ()
+
+        # Use rapidfuzz to find matches; the index is already lowercased
         matches = process.extract(
             query,
-            self.glossary.all_searchable_terms,
-            scorer=fuzz.WRatio,
-            limit=10,  # Get more matches to filter
+            self.glossary.search_index_lower,
+            scorer=self._scorer,
+            processor=None,
+            limit=max_candidates,  # Get more matches than needed to filter duplicates
             score_cutoff=threshold
         )
+        return self._fold_matches((index, score) for _, score, index in matches)
+
+    def search_many(self, queries: List[str], threshold: int = 80,
+                    max_candidates: int = 10) -> List[Tuple[Tuple[str, float], ...]]:
+        """Fuzzy match many queries with batched rapidfuzz cdist calls.
+
+        Returns one tuple of (original term, confidence) pairs per query, best first.
+        """
+        index_lower = self.glossary.search_index_lower
+        if not queries or not index_lower:
+            return [() for _ in queries]
 
-        for match_text, score, _ in matches:
+        queries_lower = [query.lower() for query in queries]
+        k = min(max_candidates, len(index_lower))
+        # Bound the dense score matrix so large batches don't allocate misses x index cells at once
+        rows_per_chunk = max(1, CDIST_MAX_CELLS // len(index_lower))
+
+        results = []
+        for start in range(0, len(queries_lower), rows_per_chunk):
+            chunk = queries_lower[start:start + rows_per_chunk]
+            # Score the chunk against every index entry in one call; entries below the cutoff score 0
+            scores = process.cdist(
+                chunk,
+                index_lower,
+                scorer=self._scorer,
+                processor=None,
+                score_cutoff=threshold,
+                workers=-1
+            )
+
+            for query, row in zip(chunk, scores):
+                # Keep every candidate tied with the k-th best score (allowing for float32 rounding),
+                # so ties are resolved by index like extract() rather than by argpartition's choice
+                kth = np.partition(row, len(row) - k)[len(row) - k]
+                if kth <= 0 and threshold > 0:
+                    top = np.flatnonzero(row > 0)  # Scores below the cutoff are zeroed
+                else:
+                    top = np.flatnonzero(row >= kth - CDIST_TIE_EPSILON)
+
+                # Re-score the selected candidates so confidences are exactly what extract() gives
+                rescored = [
+                    (int(index), self._scorer(query, index_lower[index], processor=None, score_cutoff=threshold))
+                    for index in top
+                ]
+                rescored.sort(key=lambda hit: (-hit[1], hit[0]))  # Best score first, ties in index order like extract()
+                results.append(self._fold_matches(
+                    (index, score) for index, score in rescored[:k] if score >= threshold
+                ))
+        return results
+
+    def _fold_matches(self, matches: Iterable[Tuple[int, float]]) -> Tuple[Tuple[str, float], ...]:
+        """Fold (index, score) hits onto their glossary terms, dropping duplicates, best first."""
+        results = []
+        seen_terms = set()
+
+        for index, score in matches:
             # Get the original term this match belongs to
-            original_term = self.glossary.get_original_term(match_text)
+            original_term = self.glossary.search_index_original[index]
 
             # Avoid duplicates
             if original_term in seen_terms:
@@ -76,29 +227,24 @@ class FuzzySearch:
 
             # Only include if it's actually in our glossary
             if self.glossary.term_exists(original_term):
-                term_obj = self.glossary.get_term_object(original_term)
-                results.append(TermResult(
-                    term=original_term,
-                    definitions=term_obj.definitions,
-                    confidence=score / 100.0,  # Convert to 0-1 scale
-                    match_type="fuzzy"
-                ))
+                results.append((original_term, score / 100.0))  # Convert to 0-1 scale
 
         # Sort by confidence
-        results.sort(key=lambda x: x.confidence, reverse=True)
-        return results
+        results.sort(key=lambda x: x[1], reverse=True)
+        return tuple(results)
 
     def get_suggestions(self, query: str, threshold: int = 80, max_suggestions: int = 5) -> List[str]:
         """Get fuzzy matching suggestions using rapidfuzz."""
-        if not self.glossary.all_searchable_terms:
+        if not self.glossary.search_index_lower:
             return []
 
-        # Use rapidfuzz to find the best matches
+        # Use rapidfuzz to find the best matches against the lowercased index
         matches = process.extract(
-            query,
-            self.glossary.all_searchable_terms,
-            scorer=fuzz.WRatio,  # Weighted ratio for better results
-            limit=max_suggestions,
+            query.lower(),
+            self.glossary.search_index_lower,
+            scorer=self._scorer,
+            processor=None,
+            limit=max(5, max_suggestions * 2),  # Headroom for see-also duplicates
             score_cutoff=threshold
         )
 
@@ -106,24 +252,32 @@ class FuzzySearch:
         suggestions = []
         seen_terms = set()
 
-        for match_text, score, _ in matches:
+        for _, score, index in matches:
             # Get the original term this match belongs to
-            original_term = self.glossary.get_original_term(match_text)
+            original_term = self.glossary.search_index_original[index]
             if original_term not in seen_terms:
                 suggestions.append(original_term)
                 seen_terms.add(original_term)
 
-        return suggestions
+        return suggestions[:max_suggestions]
 
 
 class AgenticSearch:
     """Handles AI-powered contextual search using PydanticAI."""
 
-    def __init__(self, glossary_manager: GlossaryManager, model: str = "google-gla:gemini-2.0-flash"):
+    # Number of retrieved candidate terms sent to the model instead of the whole glossary
+    MAX_CANDIDATES = 50
+
+    def __init__(self, glossary_manager: GlossaryManager, model: str = "google-gla:gemini-2.0-flash",
+                 fuzzy_search: Optional[FuzzySearch] = None):
         self.glossary = glossary_manager
         self.model = model
+        self.fuzzy = fuzzy_search or FuzzySearch(glossary_manager)
         self.agent = None
-        self._initialize_agent()
+        # Ask Anthropic to cache the system prompt (instructions + glossary) when it is the
+        # same for every query; OpenAI and Gemini cache long identical prefixes automatically
+        self._cache_settings = {"anthropic_cache_instructions": True} if model.startswith("anthropic:") else None
+        self._initialize_agent()  # Also binds self.search
 
     def _initialize_agent(self):
         """Initialize the PydanticAI agent if possible."""
@@ -141,38 +295,56 @@ class AgenticSearch:
                 ),
             )
 
-            @self.agent.tool
-            async def search_glossary_content(ctx: RunContext[str], query: str) -> str:
-                """Search through the glossary content for relevant terms."""
-                return f"User query: {query}\n\nGlossary content:\n{ctx.deps}"
+            @self.agent.system_prompt
+            def glossary_content(ctx: RunContext[str]) -> str:
+                """Put the glossary after the fixed instructions and ahead of the user query."""
+                return f"Glossary:\n{ctx.deps}"
 
         except Exception as e:
             print(f"Warning: Could not initialize AI agent: {e}")
             self.agent = None
 
-    async def search(self, query: str, context: Optional[str] = None) -> List[TermResult]:
-        """AI-powered contextual search across the glossary."""
+        # Choose the search implementation once rather than checking self.agent per call
         if self.agent is None:
-            # Fallback to fuzzy search
-            print("AI agent not available, falling back to fuzzy search")
-            fuzzy_search = FuzzySearch(self.glossary)
-            results = fuzzy_search.search(query, threshold=60)[:3]
-            # Mark as agentic fallback
-            for result in results:
-                result.match_type = "agentic_fallback"
-            return results
-
+            print("AI agent not available, smart queries will fall back to fuzzy search")
+            self.search = self._search_fallback
+        else:
+            self.search = self._search_with_agent
+
+    def candidates_for(self, query: str, k: int = MAX_CANDIDATES) -> List[str]:
+        """Retrieve up to k likely-relevant terms by fuzzy name match and BM25 over definitions."""
+        candidates = self.fuzzy.get_suggestions(query, threshold=40, max_suggestions=k)
+        candidates.extend(self.glossary.bm25_search(query, k))
+        return list(dict.fromkeys(candidates))[:k]
+
+    def _glossary_text_for(self, query: str) -> Tuple[str, bool]:
+        """Get the glossary text to send to the model for a query, and whether it is the full glossary."""
+        if len(self.glossary.term_texts) <= self.MAX_CANDIDATES:
+            return self.glossary.get_all_terms_text(), True
+
+        candidates = self.candidates_for(query)
+        if not candidates:
+            # Nothing retrieved; let the model see everything rather than nothing
+            return self.glossary.get_all_terms_text(), True
+        return self.glossary.get_terms_text(candidates), False
+
+    async def _search_with_agent(self, query: str, context: Optional[str] = None) -> List[TermResult]:
+        """AI-powered contextual search across the glossary; bound as search() when the agent is available."""
         try:
             # Prepare the search query with context
             full_query = query
             if context:
                 full_query = f"{query} (Context: {context})"
 
-            # Get glossary content for AI analysis
-            glossary_text = self.glossary.get_all_terms_text()
+            # Get glossary content for AI analysis, narrowed to likely candidates
+            glossary_text, is_full_glossary = self._glossary_text_for(full_query)
+
+            # Only the full glossary text is identical across queries; marking a per-query
+            # candidate block for caching would pay for a cache write on every call
+            model_settings = self._cache_settings if is_full_glossary else None
 
             # Run AI agent to find relevant terms
-            result = await self.agent.run(full_query, deps=glossary_text)
+            result = await self.agent.run(full_query, deps=glossary_text, model_settings=model_settings)
             relevant_terms = result.output
 
             # Look up the full details for each relevant term
@@ -185,17 +357,20 @@ class AgenticSearch:
                         term=term,
                         definitions=term_obj.definitions,
                         confidence=1.0,  # AI found it relevant
-                        match_type="agentic"
+                        match_type="agentic",
+                        see_also_union=term_obj.see_also_union
                     ))
 
             return responses
 
         except Exception as e:
             print(f"Error in agentic search: {e}")
-            # Fallback to fuzzy search
-            fuzzy_search = FuzzySearch(self.glossary)
-            results = fuzzy_search.search(query, threshold=60)[:3]
-            # Mark as agentic fallback
-            for result in results:
-                result.match_type = "agentic_fallback"
-            return results
+            return await self._search_fallback(query, context)
+
+    async def _search_fallback(self, query: str, context: Optional[str] = None) -> List[TermResult]:
+        """Fuzzy search fallback; bound as search() when the agent could not be initialized."""
+        results = self.fuzzy.search(query, threshold=60, max_candidates=6)[:3]
+        # Mark as agentic fallback
+        for result in results:
+            result.match_type = "agentic_fallback"
+        return results